@@ -10,7 +10,7 @@ import argparse
 import sys
 import errno
 import psycopg2
-from amtt.parser import make_parser
+from amtt.parser import make_parser_fast
 from amtt.db import StoreHandler
 import logging
 
@@ -76,12 +76,20 @@ if __name__ == '__main__':
 
     elif args.action == 'parse':
 
-        print("Compile insert queries...", file=sys.stderr)
-        handler.compile_inserts()
-        parser = make_parser(handler)
+        # bulk load: do not wait for WAL flush on commit. A crash may
+        # lose the last commits, the feed can simply be parsed again
+        cursor = connection.cursor()
+        cursor.execute("SET synchronous_commit = off")
+        cursor.close()
+        connection.commit()
+        parser = make_parser_fast(handler)
 
         print("Parsing...")
-        parser.parse(args.url)
+        try:
+            parser.parse(args.url)
+        except BaseException:
+            handler.abort()
+            raise
 
     elif args.action == 'stats':
         import os
@@ -98,3 +106,5 @@ if __name__ == '__main__':
                 pass
             else:
                 raise
+
+    handler.close()
@@ -7,13 +7,14 @@
 # the BSD License: http://www.opensource.org/licenses/bsd-license.php.
 
 import os
+import io
+import csv
 import functools
-import psycopg2
 import amtt.parser
 
 
 import logging
-from logging import DEBUG, INFO, WARNING, ERROR, CRITICAL
+from logging import DEBUG
 logger = logging.getLogger(__name__)
 
 DROP = [
@@ -27,45 +28,54 @@ MONEY_SCALE = 2
 MONEY_PRECISION = (10 + MONEY_SCALE)
 
 
-SELECTION_MONEY_COLUMN_NAMES = [
+SELECTION_MONEY_COLUMN_NAMES = tuple(
     "%s%s%s" % (prefix, medium, suffix)
     for suffix in map(str, range(1, 4))
     for prefix in ["back", "lay"]
     for medium in ["p", "s"]
+)
+
+# foreign keys of the child tables: event, subevent and selection
+FOREIGN_KEYS = [
+    ('event', 'event_betfair_fkey',
+     'foreign key(betfair_id) references betfair(id)'),
+    ('subevent', 'subevent_event_fkey',
+     'foreign key(betfair_id, event_id) references event(betfair_id, id)'),
+    ('selection', 'selection_subevent_fkey',
+     'foreign key(betfair_id, event_id, subevent_id) '
+     'references subevent(betfair_id, event_id, id)'),
 ]
 
 CREATE = [
     # betfair
     '''CREATE TABLE betfair (
-      id    serial,
-      sport varchar(16),
+      id    serial, -- StoreHandler takes ids from its sequence
+      sport text,
       primary key(id)
     )''',
 
     # event
     '''CREATE TABLE event (
       betfair_id int,
-      id         serial,
-      name       varchar(128),
+      id         serial, -- StoreHandler takes ids from its sequence
+      name       text,
       date       date,
-      foreign key(betfair_id)
-        references betfair(id),
+      constraint %s %s,
       primary key(betfair_id, id)
-    )''',
+    )''' % FOREIGN_KEYS[0][1:],
 
     # subevent
     '''CREATE TABLE subevent (
       betfair_id int,
       event_id   int,
       id         int,
-      title      varchar(64),
+      title      text,
       date       date,
       time       time,
       totalAmountMatched int, -- I do not sure what it means
-      foreign key(betfair_id, event_id)
-        references event(betfair_id, id),
+      constraint %s %s,
       primary key(betfair_id, event_id, id)
-    )''',
+    )''' % FOREIGN_KEYS[1][1:],
 
     # selection
     '''CREATE TABLE selection(
@@ -73,65 +83,87 @@ CREATE = [
       event_id    int,
       subevent_id int,
       id          int,
-      name        varchar(64),
+      name        text,
       %s,
-      foreign key(betfair_id, event_id, subevent_id)
-        references subevent(betfair_id, event_id, id),
+      constraint %s %s,
       primary key(betfair_id, event_id, subevent_id, id, name)
-    )''' % (',%s      ' % os.linesep).join(
+    )''' % (((',%s      ' % os.linesep).join(
         ["%s decimal(%s, %s)" % (name, MONEY_PRECISION, MONEY_SCALE)
-         for name in SELECTION_MONEY_COLUMN_NAMES]),
+         for name in SELECTION_MONEY_COLUMN_NAMES]),) +
+        FOREIGN_KEYS[2][1:]),
 ]
 
 
-def plist(count):
-    return ', '.join(['$%s' % index for index in range(1, count+1)])
+# initial load: foreign keys are dropped while rows are copied and
+# checked once, when they are added back at the end of parse. They are
+# looked up instead of taken from FOREIGN_KEYS: tables created by older
+# versions have keys named by PostgreSQL (e.g. event_betfair_id_fkey)
+LIST_FOREIGN_KEYS = '''SELECT conrelid::regclass, quote_ident(conname),
+    pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])
+    ORDER BY conrelid, conname'''
+DROP_FOREIGN_KEY = 'ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s'
+ADD_FOREIGN_KEY = 'ALTER TABLE %s ADD CONSTRAINT %s %s'
 
 
-PREPARE_INSERT = [
-    '''PREPARE betfair_insert AS INSERT INTO betfair(
+COPY = [
+    '''COPY betfair(
+        id,
         sport
-    ) VALUES(%s) RETURNING id''' % plist(1),
-
-    '''PREPARE event_insert AS INSERT INTO event(
-         betfair_id,
-         name,
-         date
-    ) VALUES(%s) RETURNING id''' % plist(3),
-
-    '''PREPARE subevent_insert AS INSERT INTO subevent(
-         betfair_id,
-         event_id,
-         id,
-         title,
-         date,
-         time,
-         totalAmountMatched
-    ) VALUES(%s) RETURNING id''' % plist(7),
-
-    '''PREPARE selection_insert AS INSERT INTO selection(
+    ) FROM STDIN WITH CSV''',
+
+    '''COPY event(
+        betfair_id,
+        id,
+        name,
+        date
+    ) FROM STDIN WITH CSV''',
+
+    '''COPY subevent(
+        betfair_id,
+        event_id,
+        id,
+        title,
+        date,
+        time,
+        totalAmountMatched
+    ) FROM STDIN WITH CSV''',
+
+    '''COPY selection(
         betfair_id,
         event_id,
         subevent_id,
         id,
         name,
         %s
-    ) VALUES(%s) RETURNING id''' % (
-        (',%s        ' % os.linesep).join(SELECTION_MONEY_COLUMN_NAMES),
-        plist(17))
+    ) FROM STDIN WITH CSV''' % (
+        (',%s        ' % os.linesep).join(SELECTION_MONEY_COLUMN_NAMES))
 ]
 
 
-def plist(count):
-    return ', '.join(['%s'] * count)
+# betfair and event ids are taken from their serial sequences by blocks:
+# one round-trip per ID_BLOCK rows, and concurrent loaders never share ids
+ID_BLOCK = 1000
+RESERVE_ID = [
+    "SELECT nextval(pg_get_serial_sequence('%s', 'id')) "
+    "FROM generate_series(1, %s)" % (table, ID_BLOCK)
+    for table in ['betfair', 'event']
+]
 
+# no betfair rows means all tables are empty (foreign keys). Checked
+# again under LOAD_LOCK before initial load: another loader may be in
+# the middle of its own one; the lock is held until commit or rollback
+IS_EMPTY = 'SELECT NOT EXISTS (SELECT 1 FROM betfair)'
+LOAD_LOCK_KEY = 0x616d7474  # 'amtt' in ASCII
+LOAD_LOCK = 'SELECT pg_advisory_xact_lock(%s)' % LOAD_LOCK_KEY
 
-INSERT = [
-    '''EXECUTE betfair_insert(%s)''' % plist(1),
-    '''EXECUTE event_insert(%s)''' % plist(3),
-    '''EXECUTE subevent_insert(%s)''' % plist(7),
-    '''EXECUTE selection_insert(%s)''' % plist(17),
-]
+
+# buffered rows (all tables together) before they are sent with COPY
+FLUSH_ROWS = 10000
+
+# rows fetched per round-trip by list_events
+LIST_ITERSIZE = 2000
 
 
 STATS = [
@@ -142,14 +174,20 @@ STATS = [
 ]
 
 
-CLEAR = [
-    'DELETE FROM betfair',
-    'DELETE FROM event',
-    'DELETE FROM subevent',
-    'DELETE FROM selection',
+TABLES = [
+    'betfair',
+    'event',
+    'subevent',
+    'selection'
 ]
 
 
+# one statement for all tables: no per-row work, unlike DELETE;
+# CASCADE also empties subevent/selection when only betfair/event are used.
+# No RESTART IDENTITY: handlers may still hold ids reserved by RESERVE_ID
+CLEAR = 'TRUNCATE %s CASCADE'
+
+
 QUERY_BETFAIR = 0
 QUERY_EVENT = 1
 QUERY_SUBEVENT = 2
@@ -159,50 +197,123 @@ QUERY_SELECTION = 3
 def debug(method):
     @functools.wraps(method)
     def wrapper(self, *args, **kwargs):
-        self._debug(method.__name__, *args, **kwargs)
+        if logger.isEnabledFor(DEBUG):
+            self._debug(method.__name__, *args, **kwargs)
         return method(self, *args, **kwargs)
     return wrapper
 
 
 class StoreHandler(amtt.parser.UserHandler):
-    def __init__(self, conn, full=False):
+    def __init__(self, conn=None, full=False, pool=None):
+        ''' conn is a psycopg2 connection, or pass pool (psycopg2.pool)
+        instead: then a connection is taken from it for each operation
+        (a whole document for parse) and given back afterwards.
+        If parse of a document fails, call abort(): it rolls back the
+        rows loaded since start() and gives the connection back '''
+        assert((conn is None) != (pool is None))
         self._full = full
         self._conn = conn
+        self._pool = pool
         self._cursor = None
         self._betfair = None
         self._event = None
         self._subevent = None
+        # reserved ids not used yet, for RESERVE_ID
+        self._ids = ([], [])
+        self._buffers = None
+        self._writers = None
+        self._rows = 0
         self._queries = {}
         for (key, queries) in [('create', CREATE),
-                               ('compile_inserts', PREPARE_INSERT),
-                               ('stats', STATS),
-                               ('clear', CLEAR)]:
+                               ('copy', COPY),
+                               ('stats', STATS)]:
             if full:
                 self._queries[key] = queries
             else:
                 self._queries[key] = queries[:2]
-        self._queries['drop'] = reversed(DROP)
-        self._queries['clear'] = reversed(self._queries['clear'])
+        tables = TABLES if full else TABLES[:2]
+        self._queries['drop'] = list(reversed(DROP))
+        self._queries['clear'] = [CLEAR % ', '.join(tables)]
+        self._children = tables[1:]
+        # foreign keys dropped by start() of initial load, for end()
+        self._foreign_keys = []
+
+    def _acquire(self):
+        if self._pool is not None:
+            if self._conn is not None:
+                raise RuntimeError(
+                    "StoreHandler connection is in use: finish iterating "
+                    "stats()/list_events() (or parse) first")
+            self._conn = self._pool.getconn()
+        # one cursor per connection, kept until close() (or until the
+        # connection goes back to the pool)
+        if self._cursor is None:
+            self._cursor = self._conn.cursor()
+
+    def _release(self):
+        if self._pool is not None:
+            self.close()
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
 
     def _execute(self, queries):
+        self._acquire()
         try:
-            cursor = self._conn.cursor()
-            for query in queries:
-                logger.debug("executing '%s'", query)
-                cursor.execute(query)
+            self._run(queries)
             self._conn.commit()
         except BaseException:
             self._conn.rollback()
             raise
         finally:
-            cursor.close()
+            self._release()
 
-    @debug
-    def _insert(self, index, *args):
-        query = INSERT[index]
-        self._cursor.execute(query, args)
+    def _run(self, queries):
+        for query in queries:
+            logger.debug("executing '%s'", query)
+            self._cursor.execute(query)
+
+    def _take_id(self, index):
+        ids = self._ids[index]
+        if not ids:
+            query = RESERVE_ID[index]
+            logger.debug("executing '%s'", query)
+            self._cursor.execute(query)
+            ids.extend(row[0] for row in reversed(self._cursor.fetchall()))
+        return ids.pop()
+
+    def _is_empty(self):
+        logger.debug("executing '%s'", IS_EMPTY)
+        self._cursor.execute(IS_EMPTY)
         return self._cursor.fetchone()[0]
 
+    def _list_foreign_keys(self):
+        logger.debug("executing '%s'", LIST_FOREIGN_KEYS)
+        self._cursor.execute(LIST_FOREIGN_KEYS, (self._children,))
+        return self._cursor.fetchall()
+
+    def _write(self, index, row):
+        self._writers[index].writerow(row)
+        self._rows += 1
+        if self._rows >= FLUSH_ROWS:
+            self._flush()
+
+    @debug
+    def _flush(self):
+        # parent tables go first, so foreign keys of children are satisfied
+        for (query, buf) in zip(self._queries['copy'], self._buffers):
+            if buf.tell():
+                buf.seek(0)
+                logger.debug("executing '%s'", query)
+                self._cursor.copy_expert(query, buf)
+                buf.seek(0)
+                buf.truncate()
+        self._rows = 0
+
     @debug
     def create_tables(self):
         self._execute(self._queries['create'])
@@ -210,10 +321,8 @@ class StoreHandler(amtt.parser.UserHandler):
     @debug
     def drop_tables(self):
         self._execute(self._queries['drop'])
-
-    @debug
-    def compile_inserts(self): 
-        return self._execute(self._queries['compile_inserts'])
+        # reserved from the dropped sequences
+        self._ids = ([], [])
 
     @debug
     def clear(self):
@@ -221,94 +330,139 @@ class StoreHandler(amtt.parser.UserHandler):
 
     @debug
     def list_events(self):
+        self._acquire()
+        cursor = None
         try:
-            cursor = self._conn.cursor()
+            # named (server-side) cursor: rows are fetched by itersize
+            # chunks instead of loading the whole result set
+            cursor = self._conn.cursor(name='list_events')
+            cursor.itersize = LIST_ITERSIZE
             query = "SELECT name FROM event"
             logger.debug("executing '%s'", query)
             cursor.execute(query)
             for row in cursor:
                 yield row
+        except GeneratorExit:
+            # consumer stopped early: nothing failed, only the cursor is
+            # closed; rollback would discard uncommitted work of start()
+            # on a shared connection (pooled one is rolled back by pool)
+            raise
         except BaseException:
-            conn.rollback()
+            # rollback invalidates a named cursor, close it first
+            if cursor is not None:
+                cursor.close()
+                cursor = None
+            self._conn.rollback()
             raise
         finally:
-            cursor.close()
+            if cursor is not None:
+                cursor.close()
+            self._release()
 
     @debug
     def stats(self):
-        cursor = self._conn.cursor()
-        # get query for event
-        query = self._queries['stats'][1]
-        cursor.execute(query)
-        yield cursor
-        self._conn.commit()
-        cursor.close()
+        self._acquire()
+        try:
+            # get query for event
+            query = self._queries['stats'][1]
+            self._cursor.execute(query)
+            yield self._cursor
+            self._conn.commit()
+        finally:
+            # also when the consumer stops early
+            self._release()
 
     def _log(self, level, method, *args, **kwargs):
         if logger.isEnabledFor(level):
             args = list(map(str,args))
             kwargs = ["%s=%s" % (name, str(kwargs[name])) for name in kwargs]
-            message = "conn=%s, %s(%s)" % (self._conn,
-                                           method,
-                                           ", ".join(args + kwargs))
-            logger.log(level, message)
+            logger.log(level, "conn=%s, %s(%s)",
+                       self._conn, method, ", ".join(args + kwargs))
 
     def _debug(self, method, *args, **kwargs):
         self._log(DEBUG, method, *args, **kwargs)
 
     @debug
     def start(self):
-        assert(not self._cursor)
-        self._cursor = self._conn.cursor()
+        assert(self._writers is None)
+        self._acquire()
+        # empty tables: validate the loaded rows once at the end
+        # instead of per row
+        if self._is_empty():
+            # end the transaction of the check first: its lock on betfair
+            # would block the loader holding LOAD_LOCK (deadlock)
+            self._conn.rollback()
+            self._run([LOAD_LOCK])
+            if self._is_empty():
+                self._foreign_keys = self._list_foreign_keys()
+                self._run([DROP_FOREIGN_KEY % key[:2]
+                           for key in self._foreign_keys])
+        self._buffers = [io.StringIO() for query in self._queries['copy']]
+        # quote strings: an unquoted empty field means NULL for COPY
+        self._writers = [csv.writer(buf,
+                                    lineterminator='\n',
+                                    quoting=csv.QUOTE_NONNUMERIC)
+                         for buf in self._buffers]
+        self._rows = 0
 
     @debug
     def end(self):
+        self._flush()
+        self._run([ADD_FOREIGN_KEY % key for key in self._foreign_keys])
+        self._foreign_keys = []
         self._conn.commit()
-        self._cursor.close()
-        self._cursor = None
+        self._release()
+        self._buffers = None
+        self._writers = None
 
     @debug
+    def abort(self):
+        ''' ends failed parse (between start() and end()): rolls back
+        the loaded rows and dropped foreign keys, and gives the pooled
+        connection back, so the handler can parse again '''
+        self._buffers = None
+        self._writers = None
+        # rollback brings the dropped foreign keys back
+        self._foreign_keys = []
+        if self._conn is None:
+            # pooled and already released
+            return
+        try:
+            self.close()
+            self._conn.rollback()
+        finally:
+            self._release()
+
+    # callbacks below run once per XML element: no @debug, its call
+    # logging would cost more than the row itself
     def startBetfair(self, *args):
-        assert(self._cursor)
-        self._betfair = self._insert(QUERY_BETFAIR, *args)
+        assert(self._writers)
+        self._betfair = self._take_id(QUERY_BETFAIR)
+        self._write(QUERY_BETFAIR, (self._betfair,) + args)
 
-    @debug
     def startEvent(self, *args):
-        assert(self._cursor)
-        self._event = self._insert(QUERY_EVENT,
-                                   self._betfair,
-                                   *args)
+        assert(self._writers)
+        self._event = self._take_id(QUERY_EVENT)
+        self._write(QUERY_EVENT, (self._betfair, self._event) + args)
 
-    @debug
-    def startSubEvent(self, *args):
-        assert(self._cursor)
+    def startSubEvent(self, id, *args):
+        assert(self._writers)
         assert(self._full)
-        self._subevent = self._insert(QUERY_SUBEVENT,
-                                      self._betfair,
-                                      self._event,
-                                      *args)
+        # key of the subevent, prefix of every selection row inside it
+        self._subevent = (self._betfair, self._event, id)
+        self._write(QUERY_SUBEVENT, self._subevent + args)
 
-    @debug
     def selection(self, *args):
-        assert(self._cursor)
+        assert(self._writers)
         assert(self._full)
-        self._insert(QUERY_SELECTION,
-                     self._betfair,
-                     self._event,
-                     self._subevent,
-                     *args)
-
+        self._write(QUERY_SELECTION, self._subevent + args)
 
-    @debug
     def endBetfair(self):
         self._betfair = None
-        pass
 
-    @debug
     def endEvent(self):
         self._event = None
 
-    @debug
     def endSubEvent(self):
         assert(self._full)
         self._subevent = None
@@ -30,6 +30,29 @@ Example of usage (simple):
     parser = make_parser(user_handler)
     parser.parse('/path/to/xml')
 
+Example of usage (fast, drives expat directly instead of xml.sax):
+
+    user_handler = UserHandler()
+    parser = make_parser_fast(user_handler)
+    parser.parse('/path/to/xml')
+
+Money values of <selection> are decimal.Decimal by default. Pass
+money=Parser.cents to make_parser/make_parser_fast to get them
+as int number of hundredths (cents) instead, it is much cheaper:
+
+    parser = make_parser_fast(user_handler, money=Parser.cents)
+
+or money=Parser.float for float: cheapest, but binary floating point,
+e.g. 0.1 + 0.2 != 0.3, so do not sum or compare prices exactly:
+
+    parser = make_parser_fast(user_handler, money=Parser.float)
+
+Example of usage (pull, events as tuples, no UserHandler):
+
+    for event in iter_events('/path/to/xml'):
+        if event[0] == 'selection':
+            # your implementation here
+
 Example of usage (flexible):
 
     import xml.sax
@@ -47,10 +70,16 @@ Example of usage (flexible):
 
 import xml.sax.handler
 import xml.sax.xmlreader
+import xml.sax.saxutils
+import xml.sax.expatreader
+import xml.parsers.expat
 import decimal
+import functools
+import collections
 from datetime import date, time, datetime
 
 import logging
+from logging import DEBUG
 logger = logging.getLogger(__name__)
 
 
@@ -163,102 +192,159 @@ class UserHandler(object):
         self.__not_implemented('endSubEvent')
 
 
-class Parser(object):
-    class Attribute(object):
-        def __init__(self, locator, name):
-            super().__init__()
-            self._locator = locator
-            self._name = name
+# Feeds repeat the same dates, times and prices a lot:
+# convert each distinct string only once
+PARSE_CACHE_SIZE = 4096
 
-        @property
-        def name(self):
-            return self._name
 
-        def parse(self, value):
-            try:
-                logger.debug("attribute name=%s type=%s attempt to parse '%s'",
-                             self.name,
-                             self.__class__.__name__,
-                             value)
-                return self._parse(value)
-            except (ValueError, decimal.InvalidOperation):
-                e = AttributeTypeError(self._locator,
-                                       self._name,
-                                       self.__class__.__name__,
-                                       value)
-                logger.error(e)
-                raise e
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_money(value):
+    # incompatible with Python 2.x
+    return decimal.Decimal(value)
 
-        def _parse(self, value):
-            message = "%s.parse(value)" % (self.__class__.__name__)
-            e = NotImplementedError(message)
-            logger.critical(e)
-            raise e
 
-    class String(Attribute):
-        def _parse(self, value):
-            return value
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cents(value):
+    # "12.3" -> 1230, more than 2 decimal places is error; surrounding
+    # whitespace is allowed, like Decimal does for money
+    units, point, cents = value.strip().partition('.')
+    if (len(cents) > 2 or (cents and not cents.isdigit()) or
+            not (units.lstrip('+-') or cents)):
+        raise ValueError(value)
+    return int(units + cents.ljust(2, '0'))
 
-    class Int(Attribute):
-        def _parse(self, value):
-            return int(value)
 
-    class Money(Attribute):
-        def _parse(self, value):
-            # incompatible with Python 2.x
-            return decimal.Decimal(value)
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_date(value):
+    # feeds use zero-padded dd/mm/yyyy: slice it instead of strptime,
+    # anything else goes the strptime way
+    if (len(value) == 10 and value[2] == value[5] == '/' and
+            value[:2].isdigit() and value[3:5].isdigit() and
+            value[6:].isdigit()):
+        return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+    return datetime.strptime(value, "%d/%m/%Y").date()
 
-    class Date(Attribute):
-        def _parse(self, value):
-            return datetime.strptime(value, "%d/%m/%Y").date()
 
-    class Time(Attribute):
-        def _parse(self, value):
-            return datetime.strptime(value, "%H:%M").time()
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_time(value):
+    # zero-padded hh:mm, see _parse_date
+    if (len(value) == 5 and value[2] == ':' and
+            value[:2].isdigit() and value[3:].isdigit()):
+        return time(int(value[:2]), int(value[3:]))
+    return datetime.strptime(value, "%H:%M").time()
 
-    @staticmethod
-    def _create(c, name):
-        def result(locator):
-            return c(locator, name)
-        return result
+
+class Parser(object):
+    '''
+    Attribute schemes: Parser.<type>(name) describes attribute <name>
+    as Attribute(name, type_name, parse), where parse is plain function
+    from attribute value (str) to python value. Schemes are built once,
+    on module load, and shared by all parsers.
+    '''
+    Attribute = collections.namedtuple('Attribute',
+                                       ['name', 'type_name', 'parse'])
 
     @staticmethod
     def string(name):
-        return Parser._create(Parser.String, name)
+        return Parser.Attribute(name, 'String', str)
 
     @staticmethod
     def int(name):
-        return Parser._create(Parser.Int, name)
+        return Parser.Attribute(name, 'Int', int)
 
     @staticmethod
     def money(name):
-        return Parser._create(Parser.Money, name)
+        return Parser.Attribute(name, 'Money', _parse_money)
+
+    @staticmethod
+    def cents(name):
+        return Parser.Attribute(name, 'Cents', _parse_cents)
+
+    @staticmethod
+    def float(name):
+        return Parser.Attribute(name, 'Float', float)
 
     @staticmethod
     def date(name):
-        return Parser._create(Parser.Date, name)
+        return Parser.Attribute(name, 'Date', _parse_date)
 
     @staticmethod
     def time(name):
-        return Parser._create(Parser.Time, name)
+        return Parser.Attribute(name, 'Time', _parse_time)
+
+
+# compiled attribute parsing, shared by all tags with the same scheme
+# (and attribute order): parsers and handlers do not compile it again
+COMPILE_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _compile(keyed_scheme):
+    '''
+    keyed_scheme is tuple of (key, name, type_name, parse), key is
+    index of the value in attrs (attribute name or list position).
+    Generates function from attrs to tuple of parsed values, unrolled
+    for the scheme and keys, e.g.
+        def arguments(attrs):
+            return (parse0(attrs[3]), attrs[1], parse2(attrs[5]),)
+    String values are taken as is
+    '''
+    namespace = {}
+    values = []
+    for (index, (key, name, type_name, parse)) in enumerate(keyed_scheme):
+        if parse is str:
+            values.append('attrs[%r]' % (key,))
+        else:
+            namespace['parse%d' % index] = parse
+            values.append('parse%d(attrs[%r])' % (index, key))
+    source = 'def arguments(attrs):\n' \
+             '    return (%s,)\n' % ', '.join(values)
+    exec(source, namespace)
+    return namespace['arguments']
+
+
+def _no_close():
+    '''close of tags without end callback, skipped by
+    ExpatContentHandler'''
+    pass
 
 
 class Tag(object):
+    __slots__ = ('_locator', '_open', 'close', '_scheme', '_name',
+                 '_expected_names', '_expected_len',
+                 '_named_scheme', '_named_arguments',
+                 '_order', '_ordered_scheme', '_arguments')
+
     def __init__(self, locator, open, close, scheme, name):
-        super().__init__()
         self._locator = locator
         self._open = open
         self.close = close
-        self._scheme = [ascheme(locator) for ascheme in scheme]
+        self._scheme = scheme
         self._name = name
+        self._expected_names = frozenset(name for (name, type_name, parse)
+                                         in scheme)
+        self._expected_len = len(scheme)
+        self._named_scheme = tuple((name, name, type_name, parse)
+                                   for (name, type_name, parse) in scheme)
+        self._named_arguments = _compile(self._named_scheme)
+        # attribute order of the last open_ordered call, the scheme
+        # entries with the value position in that order and compiled
+        # parsing of them
+        self._order = None
+        self._ordered_scheme = None
+        self._arguments = None
 
     @property
     def name(self):
         return self._name
 
+    @property
+    def attribute_names(self):
+        return self._expected_names
+
     def _broken_names_report(self, attrs):
-        expected = set(ascheme.name for ascheme in self._scheme)
-        actual = set(attrs.getNames())
+        expected = self._expected_names
+        actual = set(attrs.keys())
         missed = list(expected.difference(actual))
         unexpected = list(actual.difference(expected))
         e = BrokenAttributes(self._locator, unexpected, missed)
@@ -266,20 +352,64 @@ class Tag(object):
         raise e
 
     def _verify_names(self, attrs):
-        if len(self._scheme) != len(attrs):
+        # names are unique: same length and no unexpected name
+        # means no missed name either
+        if (len(attrs) != self._expected_len or
+                not self._expected_names.issuperset(attrs.keys())):
             self._broken_names_report(attrs)
-        for ascheme in self._scheme:
-            if not ascheme.name in attrs:
-                self._broken_names_report(attrs)
 
     def open(self, attrs):
-        self._verify_names(attrs)
-        result = []
-        for ascheme in self._scheme:
-            value = attrs[ascheme.name]
-            parsed = ascheme.parse(value)
-            result.append(parsed)
-        self._open(*result)
+        '''attrs is mapping of attribute names to values'''
+        # names are unique: with the same length, any missed name is
+        # KeyError of the compiled parsing
+        if len(attrs) != self._expected_len:
+            self._broken_names_report(attrs)
+        try:
+            args = self._named_arguments(attrs)
+        except KeyError:
+            self._broken_names_report(attrs)
+        except (ValueError, decimal.InvalidOperation):
+            self._type_error_report(attrs, self._named_scheme)
+            raise
+        self._open(*args)
+
+    def _learn_order(self, names):
+        self._verify_names(dict.fromkeys(names))
+        positions = dict((name, 2 * index + 1)
+                         for (index, name) in enumerate(names))
+        self._ordered_scheme = tuple((positions[name], name, type_name,
+                                      parse)
+                                     for (name, type_name, parse)
+                                     in self._scheme)
+        self._arguments = _compile(self._ordered_scheme)
+        self._order = names
+
+    def _type_error_report(self, attrs, keyed_scheme):
+        for (key, name, type_name, parse) in keyed_scheme:
+            try:
+                parse(attrs[key])
+            except (ValueError, decimal.InvalidOperation):
+                e = AttributeTypeError(self._locator,
+                                       name,
+                                       type_name,
+                                       attrs[key])
+                logger.error(e)
+                raise e
+
+    def open_ordered(self, attrs):
+        '''attrs is flat [name, value, name, value, ...] list, as expat
+        gives it with ordered_attributes set. Names are verified and
+        parsing is compiled for value positions only when their order
+        changes, see _compile'''
+        names = attrs[0::2]
+        if names != self._order:
+            self._learn_order(names)
+        try:
+            args = self._arguments(attrs)
+        except (ValueError, decimal.InvalidOperation):
+            self._type_error_report(attrs, self._ordered_scheme)
+            raise
+        self._open(*args)
 
     @staticmethod
     def betfair():
@@ -329,7 +459,7 @@ class Tag(object):
         return create
 
     @staticmethod
-    def selection():
+    def selection(money=Parser.money):
         scheme = [
             Parser.int("id"),
             Parser.string("name")
@@ -338,12 +468,12 @@ class Tag(object):
             for prefix in ["back", "lay"]:
                 for medium in ["p", "s"]:
                     name = "%s%s%s" % (prefix, medium, suffix)
-                    scheme.append(Parser.money(name))
+                    scheme.append(money(name))
 
         def create(locator, data_handler):
             return Tag(locator,
                        data_handler.selection,
-                       lambda: None,
+                       _no_close,
                        scheme,
                        'selection')
         return create
@@ -376,23 +506,49 @@ class ExpatContentHandler(xml.sax.handler.ContentHandler):
                     <subevent>      # MODE_SUBEVENT
                         <selection> # MODE_SELECTION (== MODE_LEAF)
     '''
-    def __init__(self, locator, handler):
+    def __init__(self, locator, handler, money=None, ordered=False):
         '''locator is instance of xml.sax.xmlreader.Locator
-        data_handler is instance of UserHandler'''
+        data_handler is instance of UserHandler
+        money is attribute parser for <selection> money, Parser.money
+        if None
+        ordered means startElement gets attributes as flat list (expat
+        ordered_attributes), see Tag.open_ordered'''
         super().__init__()
         super().setDocumentLocator(locator)
         self._locator = locator
         self._mode = MODE_ROOT
+        # checked once per handler: logger.debug call per tag costs
+        # more than the tag itself, even with DEBUG disabled
+        self._debug = logger.isEnabledFor(DEBUG)
         self._start = handler.start
         self._end = handler.end
         if handler.full:
             scheme = SCHEME_FULL
+            if money is not None:
+                scheme = dict(scheme)
+                scheme[MODE_SELECTION] = Tag.selection(money)
         else:
             scheme = SCHEME_SHORT
 
-        def c(mode):
-            return scheme[mode](locator, handler)
-        self._tag = dict((mode, c(mode)) for mode in scheme)
+        # (name, open, close) of the expected tag, indexed by mode;
+        # no tag at MODE_ROOT and below the leaf
+        tags = [None]
+        names = set()
+        for mode in range(MODE_ROOT + 1, max(scheme) + 1):
+            tag = scheme[mode](locator, handler)
+            open = tag.open_ordered if ordered else tag.open
+            close = None if tag.close is _no_close else tag.close
+            tags.append((tag.name, open, close))
+            names.add(tag.name)
+            names.update(tag.attribute_names)
+        self._tags = tuple(tags)
+        self._names = frozenset(names)
+        self._leaf = len(self._tags)
+
+    @property
+    def names(self):
+        '''tag and attribute names of the scheme'''
+        return self._names
 
     def startDocument(self):
         logger.debug("startDocument, mode=%s", self._mode)
@@ -407,43 +563,223 @@ class ExpatContentHandler(xml.sax.handler.ContentHandler):
         self._end()
 
     def startElement(self, name, attrs):
-        logger.debug("startElement(%s), mode=%s", name, self._mode)
-        tag = self._tag.get(self._mode, None)
-        if tag:
-            if tag.name != name:
-                e = UnExpectedTag(self._locator, name, tag.name)
+        if self._debug:
+            logger.debug("startElement(%s), mode=%s", name, self._mode)
+        mode = self._mode
+        if MODE_ROOT < mode < self._leaf:
+            (expected, open, close) = self._tags[mode]
+            if expected != name:
+                e = UnExpectedTag(self._locator, name, expected)
                 logger.error(e)
                 raise e
-            tag.open(attrs)
-        self._mode += 1
+            open(attrs)
+        self._mode = mode + 1
 
     def endElement(self, name):
-        logger.debug("endElement(%s), mode=%s", name, self._mode)
-        tag = self._tag.get(self._mode, None)
-        if tag:
-            tag.close()
-        self._mode -= 1
+        if self._debug:
+            logger.debug("endElement(%s), mode=%s", name, self._mode)
+        mode = self._mode - 1
+        self._mode = mode
+        if MODE_ROOT < mode < self._leaf:
+            close = self._tags[mode][2]
+            if close is not None:
+                close()
 
 
-def make_parser(user_handler):
+# bytes read from the source at once by make_parser/make_parser_fast
+# parsers, instead of 64 KiB of xml.sax and 2 KiB of expat ParseFile
+PARSE_BUFFER_SIZE = 1024 * 1024
+
+
+class _ExpatReader(xml.sax.expatreader.ExpatParser):
+    '''
+    xml.sax expat reader
+    - with text buffering: whitespace between tags comes to
+      characters() as one call, not one per line/chunk
+    - with names interned through dict seeded by names of
+      ExpatContentHandler scheme (like FastParser does), so tag name
+      compares are identity checks
+    '''
+    def setContentHandler(self, handler):
+        super().setContentHandler(handler)
+        # merged into the interning dict of the user, if one was set;
+        # equal names of the user are replaced, compares need our objects
+        interning = self.getProperty(
+            xml.sax.handler.property_interning_dict) or {}
+        # other content handlers have no scheme names
+        names = getattr(handler, 'names', ())
+        interning.update((name, name) for name in names)
+        self.setProperty(xml.sax.handler.property_interning_dict, interning)
+
+    def reset(self):
+        # expat is created by reset, for every parse
+        super().reset()
+        self._parser.buffer_text = True
+
+
+def make_parser(user_handler, money=None):
     assert(isinstance(user_handler, UserHandler))
-    parser = xml.sax.make_parser()
+    parser = _ExpatReader(bufsize=PARSE_BUFFER_SIZE)
     locator = xml.sax.expatreader.ExpatLocator(parser)
-    content_handler = ExpatContentHandler(locator, user_handler)
+    content_handler = ExpatContentHandler(locator, user_handler, money)
     parser.setContentHandler(content_handler)
     return parser
 
 
+class FastParser(object):
+    '''
+    Parser with the same parse(source) interface as xml.sax one, but
+    ExpatContentHandler is installed directly as expat callbacks:
+    attributes come as flat list built by expat itself (ordered
+    attributes), no xml.sax reader method, no AttributesImpl and no
+    dict per tag.
+    Instance is locator for the content handler too.
+    '''
+    def __init__(self, user_handler, money=None):
+        self._expat = None
+        self._content_handler = ExpatContentHandler(self,
+                                                    user_handler,
+                                                    money,
+                                                    ordered=True)
+
+    def getLineNumber(self):
+        if self._expat is None:
+            return 1
+        return self._expat.CurrentLineNumber
+
+    def getColumnNumber(self):
+        if self._expat is None:
+            return None
+        return self._expat.CurrentColumnNumber
+
+    def _create_expat(self):
+        # expat interns names through this dict: seeded with the scheme
+        # literals, names of the document are the very same objects,
+        # so name compares in Tag and ExpatContentHandler are identity
+        # checks
+        intern = dict((name, name) for name in self._content_handler.names)
+        self._expat = xml.parsers.expat.ParserCreate(intern=intern)
+        self._expat.ordered_attributes = True
+        self._expat.StartElementHandler = self._content_handler.startElement
+        self._expat.EndElementHandler = self._content_handler.endElement
+
+    def _feed(self, stream, chunk_size):
+        # generator: parses stream by chunk_size bytes, yields after each
+        # chunk; own reads, ParseFile would read by 2 KiB whatever
+        # buffer_size is
+        while True:
+            data = stream.read(chunk_size)
+            self._expat.Parse(data, not data)
+            if not data:
+                return
+            yield
+
+    def parse(self, source):
+        '''source is file name, URL or binary file object'''
+        source = xml.sax.saxutils.prepare_input_source(source)
+        stream = source.getByteStream()
+        self._create_expat()
+        try:
+            self._content_handler.startDocument()
+            for _ in self._feed(stream, PARSE_BUFFER_SIZE):
+                pass
+            self._content_handler.endDocument()
+        finally:
+            stream.close()
+
+    def parse_chunks(self, source, chunk_size):
+        '''generator, parses source by chunk_size bytes and yields None
+        after each chunk (and after the end of document), so the caller
+        can take callback results while the parse goes on'''
+        source = xml.sax.saxutils.prepare_input_source(source)
+        stream = source.getByteStream()
+        self._create_expat()
+        try:
+            self._content_handler.startDocument()
+            yield from self._feed(stream, chunk_size)
+            self._content_handler.endDocument()
+            yield
+        finally:
+            stream.close()
+
+
+def make_parser_fast(user_handler, money=None):
+    assert(isinstance(user_handler, UserHandler))
+    return FastParser(user_handler, money)
+
+
+# bytes parsed by iter_events between two batches of events
+EVENTS_CHUNK_SIZE = 64 * 1024
+
+
+class _EventCollector(UserHandler):
+    '''UserHandler storing callbacks as event tuples, see iter_events'''
+    def __init__(self, full):
+        super().__init__(full)
+        self.events = []
+
+    def startBetfair(self, *args):
+        self.events.append(('betfair',) + args)
+
+    def startEvent(self, *args):
+        self.events.append(('event',) + args)
+
+    def startSubEvent(self, *args):
+        self.events.append(('subevent',) + args)
+
+    def selection(self, *args):
+        self.events.append(('selection',) + args)
+
+    def endBetfair(self):
+        self.events.append(('end_betfair',))
+
+    def endEvent(self):
+        self.events.append(('end_event',))
+
+    def endSubEvent(self):
+        self.events.append(('end_subevent',))
+
+
+def iter_events(source, full=True, money=None):
+    '''
+    Pull interface: generator of event tuples, no UserHandler needed.
+    Events are UserHandler callbacks: tuple of the name and arguments
+        ('betfair', sport)
+        ('event', name, date)
+        ('subevent', id, title, date, time, totalAmountMatched)
+        ('selection', id, name, *money)
+        ('end_betfair',), ('end_event',), ('end_subevent',)
+    subevent and selection events only if full.
+    Document is parsed by EVENTS_CHUNK_SIZE bytes, so only events of
+    one chunk are held in memory.
+    '''
+    collector = _EventCollector(full)
+    parser = FastParser(collector, money)
+    events = collector.events
+    for chunk in parser.parse_chunks(source, EVENTS_CHUNK_SIZE):
+        yield from events
+        del events[:]
+
+
 def get_test_suite_list():
     import functools
     import unittest
+    from os.path import join, dirname, abspath
 
-    class TestProblem(unittest.TestCase):
-        def setUp(self):
-            self.parser = xml.sax.make_parser()
-            self.locator = xml.sax.expatreader.ExpatLocator(self.parser)
-            self.message = "Line: 1 Column: None Problem: %s"
+    TEST_FILE_NAME = abspath(join(dirname(__file__), "test.xml"))
+
+    def _msg(problem):
+        '''str of Problem raised with unfed (test) locator'''
+        return "Line: 1 Column: None Problem: " + problem
 
+    class LocatorTestCase(unittest.TestCase):
+        @classmethod
+        def setUpClass(cls):
+            # shared, never fed: locator reports line 1 and no column
+            cls.parser = xml.sax.make_parser()
+            cls.locator = xml.sax.expatreader.ExpatLocator(cls.parser)
+
+    class TestProblem(LocatorTestCase):
         def test_Problem(self):
             with self.assertRaisesRegex(NotImplementedError,
                                         'Problem._problem()'):
@@ -452,75 +788,98 @@ def get_test_suite_list():
 
         def test_UnExpectedTag(self):
             problem = UnExpectedTag(self.locator, "b", "a")
+            self.assertEqual((problem.line, problem.column,
+                              problem.name, problem.expected),
+                             (1, None, "b", "a"))
             expected = "unexpected tag 'b', expected 'a'"
-            self.assertEqual(str(problem), self.message % expected)
+            self.assertEqual(str(problem), _msg(expected))
 
         def test_BrokenAttributes(self):
             problem = BrokenAttributes(self.locator, ["a", "b"], ["c", "d"])
+            self.assertEqual((problem.unexpected, problem.missed),
+                             (["a", "b"], ["c", "d"]))
             expected = "broken attributes, unexpected=[a, b], missed=[c, d]"
-            self.assertEqual(str(problem), self.message % expected)
+            self.assertEqual(str(problem), _msg(expected))
 
         def test_AttributeTypeError(self):
             problem = AttributeTypeError(self.locator,
                                          "somename",
                                          "sometype",
                                          "somevalue")
+            self.assertEqual((problem.name, problem.type_name,
+                              problem.value),
+                             ("somename", "sometype", "somevalue"))
             expected = "parse attribute 'somename' " \
                        "(expected type: 'sometype') " \
                        "invalid value 'somevalue'"
-            self.assertEqual(str(problem), self.message % expected)
+            self.assertEqual(str(problem), _msg(expected))
 
-    class TestParser(unittest.TestCase):
-        def setUp(self):
-            self.parser = xml.sax.make_parser()
-            self.locator = xml.sax.expatreader.ExpatLocator(self.parser)
-            self.message = "Line: 1 Column: None Problem: %s"
+    class TestParser(LocatorTestCase):
+        @classmethod
+        def setUpClass(cls):
+            super().setUpClass()
             fail = "parse attribute 'name' \(expected type: '%s'\) " \
-                   "invalid value 'fail'"
-            self.fail = self.message % fail
-
-        def _invalid(self, create, source):
-            parser = create("name")(self.locator)
-            fail = self.fail % parser.__class__.__name__
-            with self.assertRaisesRegex(AttributeTypeError, fail):
-                parser.parse(source)
-
-        def _correct(self, create, source, expected):
-            parser = create("name")(self.locator)
-            actual = parser.parse(source)
-            self.assertEqual(actual, expected)
-
-    class TestParserInt(TestParser):
-        def test_invalid(self):
-            self._invalid(Parser.int, "fail")
-
-        def test_correct(self):
-            self._correct(Parser.int, "123", 123)
-
-    class TestParserString(TestParser):
-        def test_correct(self):
-            self._correct(Parser.string, "some string", "some string")
-
-    class TestParserMoney(TestParser):
-        def test_invalid(self):
-            self._invalid(Parser.money, "fail")
-
-        def test_correct(self):
-            self._correct(Parser.money, "123.54", decimal.Decimal('123.54'))
+                   "invalid value '%s'"
+            cls.invalid_message = _msg(fail)
+
+        def _parse(self, create, source):
+            # attribute schemes are parsed by Tag: one attribute tag
+            result = []
+            tag = Tag(self.locator, result.append, None, [create("name")],
+                      "tag")
+            tag.open({"name": source})
+            return result[0]
+
+        def _invalid(self, create, source, msg=None):
+            fail = self.invalid_message % (create("name").type_name, source)
+            with self.assertRaisesRegex(AttributeTypeError, fail, msg=msg):
+                self._parse(create, source)
+
+        def _correct(self, create, source, expected, msg=None):
+            actual = self._parse(create, source)
+            self.assertEqual(actual, expected, msg)
+
+    class TestParserBuiltins(TestParser):
+        CORRECT = [
+            (Parser.int, "123", 123),
+            (Parser.string, "some string", "some string"),
+            (Parser.money, "123.54", decimal.Decimal('123.54')),
+            (Parser.cents, "123.54", 12354),
+            (Parser.cents, "5", 500),
+            (Parser.cents, "-0.5", -50),
+            (Parser.cents, " 1.5 ", 150),
+            (Parser.float, "123.54", 123.54),
+            (Parser.date, "13/09/2013", date(2013, 9, 13)),
+            (Parser.date, "1/9/2013", date(2013, 9, 1)),
+            (Parser.time, "12:43", time(12, 43)),
+            (Parser.time, "9:05", time(9, 5))
+        ]
 
-    class TestParserDate(TestParser):
-        def test_invalid(self):
-            self._invalid(Parser.date, "fail")
+        INVALID = [
+            (Parser.int, "fail"),
+            (Parser.money, "fail"),
+            (Parser.cents, "fail"),
+            (Parser.cents, "1.234"),
+            (Parser.float, "fail"),
+            (Parser.date, "fail"),
+            (Parser.time, "fail")
+        ]
 
+        # no subTest (Python 3.4+): msg names the failed case
         def test_correct(self):
-            self._correct(Parser.date, "13/09/2013", date(2013, 9, 13))
+            for (create, source, expected) in self.CORRECT:
+                self._correct(create, source, expected,
+                              "%s %r" % (create.__name__, source))
 
-    class TestParserTime(TestParser):
         def test_invalid(self):
-            self._invalid(Parser.time, "fail")
+            for (create, source) in self.INVALID:
+                self._invalid(create, source,
+                              "%s %r" % (create.__name__, source))
 
-        def test_correct(self):
-            self._correct(Parser.time, "12:43", time(12, 43))
+    # end events carry no arguments: one shared tuple per kind
+    END_BETFAIR = ("end", "betfair", None)
+    END_EVENT = ("end", "event", None)
+    END_SUBEVENT = ("end", "subEvent", None)
 
     class DCH(UserHandler):
         def __init__(self, full=False):
@@ -540,82 +899,95 @@ def get_test_suite_list():
             self.result.append(("start", "selection", args))
 
         def endBetfair(self):
-            self.result.append(("end", "betfair", None))
+            self.result.append(END_BETFAIR)
 
         def endEvent(self):
-            self.result.append(("end", "event", None))
+            self.result.append(END_EVENT)
 
         def endSubEvent(self):
-            self.result.append(("end", "subEvent", None))
+            self.result.append(END_SUBEVENT)
 
-    def convertAttrs(method):
-        @functools.wraps(method)
-        def wrapper(self, *args, attrs=None):
-            attrs = xml.sax.xmlreader.AttributesImpl(attrs)
-            return method(self, *args, attrs=attrs)
-        return wrapper
+    class TestTag(LocatorTestCase):
+        BETFAIR_EVENTS = (('start', 'betfair', ('value',)),
+                          ('end', 'betfair', None))
 
-    class TestTag(unittest.TestCase):
         def setUp(self):
-            self.parser = xml.sax.make_parser()
-            self.locator = xml.sax.expatreader.ExpatLocator(self.parser)
             self.dch = DCH()
-            self.message = "Line: 1 Column: None Problem: %s"
 
-        @convertAttrs
+        # attrs are plain dicts: Tag.open needs only len, keys and
+        # item access, xml.sax AttributesImpl is covered by parse tests
         def _correct(self, create, expected, attrs=None):
             parser = create(self.locator, self.dch)
             parser.open(attrs)
             parser.close()
+            actual = tuple(self.dch.result)
+            self.assertEqual(actual, tuple(expected))
 
-            def getNames():
-                return attrs.keys()
-
-            setattr(attrs, 'getNames', getNames)
-            actual = self.dch.result
-            self.assertEqual(actual, expected)
-
-        @convertAttrs
         def _invalid(self, create, message, attrs=None):
             parser = create(self.locator, self.dch)
             with self.assertRaisesRegex(BrokenAttributes,
-                                        self.message % message):
+                                        _msg(message)):
                 parser.open(attrs)
             self.assertEqual(self.dch.result, [])
 
         def test_correct(self):
             attrs = {'sport': 'value'}
-            expected = [('start', 'betfair', ('value',)),
-                        ('end', 'betfair', None)]
-            self._correct(Tag.betfair(), expected, attrs=attrs)
+            self._correct(SCHEME_FULL[MODE_BETFAIR], self.BETFAIR_EVENTS,
+                          attrs=attrs)
 
         def test_broken_attributes_one(self):
             attrs = {'sport': 'value', 'bad': 'value2'}
             expected = "broken attributes, unexpected=\[bad\], missed=\[\]"
-            self._invalid(Tag.betfair(), expected, attrs=attrs)
+            self._invalid(SCHEME_FULL[MODE_BETFAIR], expected, attrs=attrs)
 
         def test_broken_attributes_two(self):
             attrs = {'bad': 'value2'}
             expected = "broken attributes, " \
                        "unexpected=\[bad\], " \
                        "missed=\[sport\]"
-            self._invalid(Tag.betfair(), expected, attrs=attrs)
+            self._invalid(SCHEME_FULL[MODE_BETFAIR], expected, attrs=attrs)
+
+        def test_ordered(self):
+            parser = SCHEME_FULL[MODE_EVENT](self.locator, self.dch)
+            parser.open_ordered(['name', 'a', 'date', '13/09/2013'])
+            parser.open_ordered(['date', '14/09/2013', 'name', 'b'])
+            expected = [('start', 'event', ('a', date(2013, 9, 13))),
+                        ('start', 'event', ('b', date(2013, 9, 14)))]
+            self.assertEqual(self.dch.result, expected)
+
+        def test_ordered_broken_attributes(self):
+            parser = SCHEME_FULL[MODE_BETFAIR](self.locator, self.dch)
+            expected = r"broken attributes, unexpected=\[bad\], missed=\[\]"
+            with self.assertRaisesRegex(BrokenAttributes,
+                                        _msg(expected)):
+                parser.open_ordered(['sport', 'value', 'bad', 'value2'])
+            self.assertEqual(self.dch.result, [])
 
-    class ECH(ExpatContentHandler):
-        @convertAttrs
-        def startElement(self, name, attrs=None):
-            return super().startElement(name, attrs)
+        def test_selection_ordered(self):
+            parser = SCHEME_FULL[MODE_SELECTION](self.locator, self.dch)
+            money = ["%s%s%s" % (prefix, medium, suffix)
+                     for suffix in "123"
+                     for prefix in ["back", "lay"]
+                     for medium in ["p", "s"]]
+            attrs = ['name', 'a', 'id', '1']
+            for name in money:
+                attrs.extend([name, '1.50'])
+            parser.open_ordered(attrs)
+            expected = (1, 'a') + (decimal.Decimal('1.50'),) * 12
+            self.assertEqual(self.dch.result,
+                             [('start', 'selection', expected)])
+            attrs[-1] = 'fail'
+            fail = r"parse attribute 'lays3' \(expected type: 'Money'\) " \
+                   "invalid value 'fail'"
+            with self.assertRaisesRegex(AttributeTypeError,
+                                        _msg(fail)):
+                parser.open_ordered(attrs)
+            self.assertEqual(len(self.dch.result), 1)
 
-    class TestExpatContentHandlerAPI(unittest.TestCase):
+    class TestExpatContentHandlerAPI(LocatorTestCase):
         def setUp(self):
-            self.parser = xml.sax.make_parser()
-            self.locator = xml.sax.expatreader.ExpatLocator(self.parser)
             self.dch = DCH()
-            self.message = "Line: 1 Column: None Problem: %s"
-
-        @property
-        def ech(self):
-            return ECH(self.locator, self.dch)
+            self.ech = ExpatContentHandler(self.locator, self.dch)
 
         def test_create(self):
             self.assertIsInstance(self.ech, ExpatContentHandler)
@@ -643,24 +1015,38 @@ def get_test_suite_list():
         def test_parse(self):
             ech = self.ech
             ech.startDocument()
-            expected = self.message % "unexpected tag 'bad', " \
-                                      "expected 'betfair'"
+            expected = _msg("unexpected tag 'bad', "
+                            "expected 'betfair'")
             with self.assertRaisesRegex(UnExpectedTag, expected):
-                ech.startElement("bad", attrs={})
-            ech.startElement("betfair", attrs={'sport': 'value'})
-            expected = self.message % "unexpected tag 'betfair', " \
-                                      "expected 'event'"
+                ech.startElement("bad", {})
+            ech.startElement("betfair", {'sport': 'value'})
+            expected = _msg("unexpected tag 'betfair', "
+                            "expected 'event'")
             with self.assertRaisesRegex(UnExpectedTag, expected):
-                ech.startElement("betfair", attrs={'sport': 'value'})
+                ech.startElement("betfair", {'sport': 'value'})
             ech.endElement('betfair')
 
+        def test_close(self):
+            ech = self.ech
+            ech.startDocument()
+            ech.startElement("betfair", {'sport': 'value'})
+            ech.startElement("event", {'name': 'value',
+                                       'date': '13/09/2013'})
+            ech.endElement("event")
+            ech.endElement("betfair")
+            ech.endDocument()
+            expected = [('start', 'betfair', ('value',)),
+                        ('start', 'event', ('value', date(2013, 9, 13))),
+                        ('end', 'event', None),
+                        ('end', 'betfair', None)]
+            self.assertEqual(self.dch.result, expected)
+
     class TestExpatContentHandler(unittest.TestCase):
-        def parse(self, full):
+        def parse(self, full, create=make_parser):
             self.dch = DCH(full)
-            self.parser = make_parser(self.dch)
-            from os.path import join, dirname, abspath
-            TEST_FILE_NAME = abspath(join(dirname(__file__), "test.xml"))
+            self.parser = create(self.dch)
             self.parser.parse(TEST_FILE_NAME)
+            return self.dch.result
 
         def test_parse_short(self):
             self.parse(False)
@@ -668,6 +1054,29 @@ def get_test_suite_list():
         def test_parse_full(self):
             self.parse(True)
 
+        def test_parse_cents(self):
+            for create in [make_parser, make_parser_fast]:
+                create = functools.partial(create, money=Parser.cents)
+                selections = [args for (kind, name, args)
+                              in self.parse(True, create)
+                              if name == "selection"]
+                self.assertEqual(len(selections), 26)
+                self.assertEqual(selections[0][:4], (55265, "B Munich",
+                                                     500, 4525))
+
+        def test_iter_events(self):
+            expected = [(name.lower(),) + args if kind == "start"
+                        else ("end_" + name.lower(),)
+                        for (kind, name, args) in self.parse(True)]
+            actual = list(iter_events(TEST_FILE_NAME))
+            self.assertEqual(actual, expected)
+
+        def test_parse_fast(self):
+            for full in [False, True]:
+                expected = self.parse(full)
+                actual = self.parse(full, make_parser_fast)
+                self.assertEqual(actual, expected)
+
     logger.disabled = True
 
     #logging.basicConfig(level=logging.DEBUG)
@@ -677,11 +1086,7 @@ def get_test_suite_list():
     return [loader.loadTestsFromTestCase(test)
             for test in [TestProblem,
                          TestParser,
-                         TestParserInt,
-                         TestParserString,
-                         TestParserMoney,
-                         TestParserDate,
-                         TestParserTime,
+                         TestParserBuiltins,
                          TestTag,
                          TestExpatContentHandlerAPI,
                          TestExpatContentHandler]]
@@ -695,5 +1100,8 @@ __all__ = [
     'UserHandler',
     'ExpatContentHandler',
     'make_parser',
+    'FastParser',
+    'make_parser_fast',
+    'iter_events',
     'get_test_suite_list'
 ]